@@ -1,12 +1,18 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from typing import List
 from datetime import datetime, timedelta
-import requests
-from dataclasses import dataclass, field, asdict
-from enum import Enum
-import random
-from collections import defaultdict
+from dataclasses import dataclass, field
+from enum import IntEnum
+from collections import OrderedDict
+import hashlib
+import math
+import re
+import numpy as np
+import orjson
+from numba import njit
 
 # -----------------------
 # FastAPI App
@@ -17,8 +23,11 @@ app = FastAPI(title="iData API", description="Angel Broking + Analysis API")
 # Models
 # -----------------------
 # --- Input Models ---
+# Documents the /analyze body and validates anything the orjson fast path rejects.
 class CandleInput(BaseModel):
-    date: datetime
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    date: datetime = Field(description="ISO 8601, e.g. 2024-01-01T09:15:00+05:30; unix epoch numbers are also accepted")
     open: float
     high: float
     low: float
@@ -26,6 +35,8 @@ class CandleInput(BaseModel):
     volume: int
 
 class AnalysisRequest(BaseModel):
+    model_config = ConfigDict(allow_inf_nan=False)
+
     candles: List[CandleInput]
     margin: float
 
@@ -34,54 +45,127 @@ class AnalysisRequest(BaseModel):
 # -----------------------
 ANGEL_BASE_URL = "https://apiconnect.angelone.in/rest"
 
-@dataclass
-class Candle:
-    date: datetime
-    open: float
-    high: float
-    low: float
-    close: float
-    volume: int
+class Direction(IntEnum):
+    none = 0
+    up = 1
+    down = 2
 
-class Direction(str, Enum):
-    none = "none"
-    up = "up"
-    down = "down"
+# plain int copies for the jitted kernels
+DIRECTION_NONE, DIRECTION_UP, DIRECTION_DOWN = int(Direction.none), int(Direction.up), int(Direction.down)
 
-@dataclass
-class TimeData:
-    threshold: int = 0
-    time: datetime = datetime.now()
-    start_value: int = 0
-    end_value: int = 0
-    end_time: datetime = datetime.now()
-    is_enabled: bool = False
-    direction: Direction = Direction.none
-    cut_at: int = 0
-    gain: float = 0.0
-    executed_tree: bool = False
+# One trade slot per (threshold, date, hour). time_idx / end_idx index the input candles;
+# time_idx is -1 for hours without candles and end_idx is -1 while the trade is still open.
+TIME_DATA_DTYPE = np.dtype([
+    ('threshold', np.int64),
+    ('time_idx', np.int64),
+    ('start_value', np.int64),
+    ('end_value', np.int64),
+    ('end_idx', np.int64),
+    ('is_enabled', np.bool_),
+    ('direction', np.int8),
+    ('cut_at', np.int64),
+    ('gain', np.float64),
+    ('executed_tree', np.bool_),
+])
 
 @dataclass
-class DateData:
-    date: datetime
-    times: List[TimeData] = field(default_factory=list)
+class AnalysisResult:
+    thresholds: List[int]
+    dates: List[datetime]
+    slots: np.ndarray  # (thresholds, dates, hours) of TIME_DATA_DTYPE
 
 @dataclass
-class Threshold:
-    threshold: int = 0
-    dates: List[DateData] = field(default_factory=list)
+class CandleArrays:
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    dates: np.ndarray  # int64 epoch seconds
+    days: np.ndarray  # int64 ordinal of each candle's own wall-clock date
+    datetimes: List[datetime]  # original timestamps, echoed back in results
+    # per-candle quantities the kernels need, derived once from the columns above
+    high_i: np.ndarray = field(init=False)
+    low_i: np.ndarray = field(init=False)
+    is_up: np.ndarray = field(init=False)
+    upper_gap: np.ndarray = field(init=False)
+    down_gap: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.high_i = self.high.astype(np.int64)
+        self.low_i = self.low.astype(np.int64)
+        self.is_up = self.close > self.open
+        self.upper_gap = (self.high - self.close).astype(np.int64)
+        self.down_gap = (self.close - self.low).astype(np.int64)
 
 # -----------------------
 # Helper Functions
 # -----------------------
-def average_daily_gap(candles: List[Candle]) -> float:
-    daily_groups = defaultdict(list)
-    for c in candles:
-        day = c.date.date()
-        daily_groups[day].append(c)
-    gaps = [(max(day_candle.high for day_candle in v) - min(day_candle.low for day_candle in v))
-            for v in daily_groups.values()]
-    return sum(gaps)/len(gaps) if gaps else 0
+def average_daily_gap(arrays: CandleArrays) -> float:
+    if len(arrays.days) == 0: return 0
+    boundaries = np.concatenate(([0], np.flatnonzero(np.diff(arrays.days)) + 1))
+    day_high = np.maximum.reduceat(arrays.high, boundaries)
+    day_low = np.minimum.reduceat(arrays.low, boundaries)
+    return float((day_high - day_low).mean())
+
+# date strings that datetime.fromisoformat and pydantic both parse, and parse the same way;
+# any other shape is left to the pydantic fallback
+_FAST_DATE = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?(Z|[+-]\d{2}:\d{2})?')
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not _FAST_DATE.fullmatch(value):
+        raise ValueError(f"unsupported date: {value!r}")
+    return datetime.fromisoformat(value)
+
+def candles_to_arrays(candles: List[dict]) -> CandleArrays:
+    # candles are plain dicts shaped like CandleInput, with ISO 8601 string or datetime dates;
+    # anything else raises KeyError/TypeError/ValueError
+    n = len(candles)
+    datetimes = [_as_datetime(c['date']) for c in candles]
+    if not all(type(c['volume']) is int for c in candles):
+        raise TypeError("volume must be an integer")
+    prices = {key: np.fromiter((c[key] for c in candles), dtype=np.float64, count=n)
+              for key in ('open', 'high', 'low', 'close')}
+    # np.fromiter turns null into NaN instead of failing
+    if not all(np.isfinite(column).all() for column in prices.values()):
+        raise ValueError("open/high/low/close must be finite numbers")
+    return CandleArrays(
+        **prices,
+        dates=np.fromiter((int(d.timestamp()) for d in datetimes), dtype=np.int64, count=n),
+        days=np.fromiter((d.toordinal() for d in datetimes), dtype=np.int64, count=n),
+        datetimes=datetimes,
+    )
+
+def _body_error(loc: tuple, msg: str, value) -> RequestValidationError:
+    return RequestValidationError([{'type': 'value_error', 'loc': ('body', *loc), 'msg': msg, 'input': value}])
+
+def parse_analysis_request(raw: bytes):
+    # fast path: orjson straight into column arrays, skipping per-candle pydantic models
+    try:
+        body = orjson.loads(raw)
+        if not isinstance(body['candles'], list):
+            raise TypeError("candles must be a list")
+        arrays = candles_to_arrays(body['candles'])
+        margin = float(body['margin'])
+        if not math.isfinite(margin):
+            raise ValueError("margin must be finite")
+    except (KeyError, TypeError, ValueError):
+        # anything the fast path can't take goes through the full pydantic contract, which
+        # either raises FastAPI's standard 422 errors or accepts it (e.g. epoch dates)
+        try:
+            req = AnalysisRequest.model_validate_json(raw)
+        except ValidationError as e:
+            raise RequestValidationError([{**err, 'loc': ('body', *err['loc'])}
+                                          for err in e.errors(include_url=False)])
+        arrays = candles_to_arrays([c.model_dump() for c in req.candles])
+        margin = req.margin
+    if len(arrays.dates) == 0:
+        raise _body_error(('candles',), "candles must not be empty", [])
+    # hour buckets, start indices and day groups all rely on time order
+    if np.any(np.diff(arrays.dates) < 0):
+        raise _body_error(('candles',), "candles must be sorted by date", None)
+    return arrays, margin
 
 def generate_range_values(min_val: float, max_val: float, target_count: int = 16) -> List[int]:
     start, end = int(min_val+0.5), int(max_val)
@@ -106,153 +190,226 @@ def generate_date_array(start: datetime, end: datetime) -> List[datetime]:
         current += timedelta(days=1)
     return dates
 
-def random_in_bounds(min_val: int, max_val: int) -> int:
-    if min_val == max_val: return min_val
-    diff = max_val - min_val
-    if diff == 1: return random.choice([min_val, max_val])
-    if diff == 2: return min_val + 1
-    return random.randint(min_val + 1, max_val - 1)
-
-def get_random_hourly_candles(date: datetime, one_minute_data: List[Candle], thr: int) -> List[TimeData]:
-    result = []
-    hours = [9,10,11,12,13,14,15]
-    for hour in hours:
-        start_time = date.replace(hour=hour, minute=0, second=0)
-        end_time = start_time + timedelta(hours=1)
-        candles_in_hour = [c for c in one_minute_data if start_time <= c.date < end_time]
-        if candles_in_hour:
-            random_candle = random.choice(candles_in_hour)
-            td = TimeData()
-            td.time = random_candle.date
-            td.start_value = random_in_bounds(int(random_candle.low), int(random_candle.high))
-            td.threshold = thr
-            result.append(td)
-    return result
-
-def run_thread(thr: float, time_data: TimeData, candle: Candle, margin: float) -> bool:
+def random_in_bounds(min_vals: np.ndarray, max_vals: np.ndarray, u: np.ndarray) -> np.ndarray:
+    # maps uniform draws u in [0, 1) onto the candle ranges, avoiding the extremes when possible
+    diff = max_vals - min_vals
+    general = min_vals + 1 + (u * np.maximum(diff - 1, 1)).astype(np.int64)
+    return np.where(diff == 0, min_vals,
+           np.where(diff == 1, min_vals + (u < 0.5),
+           np.where(diff == 2, min_vals + 1, general)))
+
+def hourly_bounds(arr_dates: List[datetime], ts: np.ndarray):
+    # (D, 7) index ranges [lo, hi) of the 9:00..15:00 hour buckets for every date
+    day_starts = np.array([d.replace(hour=9, minute=0, second=0).timestamp() for d in arr_dates])
+    hour_offsets = np.arange(0, 8) * 3600
+    boundaries = (day_starts[:, None] + hour_offsets[None, :]).ravel()
+    idx = np.searchsorted(ts, boundaries).reshape(len(arr_dates), 8)
+    return idx[:, :7], idx[:, 1:]
+
+def get_random_hourly_candles(rng: np.random.Generator, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    # one random candle index per (date, hour) bucket, -1 where the bucket is empty
+    has_candles = hi > lo
+    picks = rng.integers(lo, np.where(has_candles, hi, lo + 1))
+    return np.where(has_candles, picks, -1)
+
+@njit(cache=True)
+def _handle_enabled_up(start_value, thr, cut_margin, cm_i, cut_at, high, hi_i, lo_i, upper_gap, hi_cut):
+    # returns (done, end_value, gain, cut_at)
+    if hi_i < cut_at:
+        return True, cut_at, float(hi_i - start_value - thr), cut_at
+    elif lo_i < cut_at:
+        return True, cut_at, float(cut_at - start_value - thr), cut_at
+    if upper_gap > cm_i:
+        return True, hi_cut, high - start_value - thr - cut_margin, cut_at
+    if hi_cut > cut_at:
+        cut_at = hi_cut
+    return False, 0, 0.0, cut_at
+
+@njit(cache=True)
+def _handle_enabled_down(start_value, thr, cut_margin, cm_i, cut_at, low, hi_i, lo_i, down_gap, lo_cut):
+    # returns (done, end_value, gain, cut_at)
+    if lo_i > cut_at:
+        return True, cut_at, float(start_value - lo_i - thr), cut_at
+    elif hi_i > cut_at:
+        return True, cut_at, float(start_value - cut_at - thr), cut_at
+    if down_gap > cm_i:
+        return True, lo_cut, start_value - low - thr - cut_margin, cut_at
+    if lo_cut < cut_at:
+        cut_at = lo_cut
+    return False, 0, 0.0, cut_at
+
+@njit(cache=True)
+def _run_from(i0, start_value, thr, margin, h, l, hi_arr, lo_arr, up_arr, upper_gap_arr, down_gap_arr):
     cut_margin = thr * (margin / 100)
-    if time_data.end_value != 0:
-        return True
-    is_up = candle.close > candle.open
-    upper_gap = int(candle.high - candle.close)
-    down_gap = int(candle.close - candle.low)
-    check_high = time_data.start_value + int(thr)
-    check_low = time_data.start_value - int(thr)
-    candle_high = int(candle.high)
-    candle_low = int(candle.low)
-    if time_data.is_enabled:
-        if time_data.direction == Direction.up:
-            if candle_high < time_data.cut_at:
-                time_data.end_value = time_data.cut_at
-                time_data.end_time = candle.date
-                time_data.gain = candle_high - time_data.start_value - thr
-                return True
-            elif candle_low < time_data.cut_at:
-                time_data.end_value = time_data.cut_at
-                time_data.end_time = candle.date
-                time_data.gain = time_data.cut_at - time_data.start_value - thr
-                return True
+    thr_i = int(thr)
+    cm_i = int(cut_margin)
+    check_high = start_value + thr_i
+    check_low = start_value - thr_i
+    direction = DIRECTION_NONE
+    is_enabled = False
+    cut_at = 0
+    for i in range(i0, len(h)):
+        hi_i = hi_arr[i]
+        lo_i = lo_arr[i]
+        if not is_enabled and not (check_high <= hi_i or check_low >= lo_i):
+            continue
+        upper_gap = upper_gap_arr[i]
+        down_gap = down_gap_arr[i]
+        hi_cut = int(h[i] - cut_margin)
+        lo_cut = int(l[i] + cut_margin)
+        if not is_enabled:
+            if upper_gap > thr_i:
+                return hi_cut, i, h[i] - start_value - thr - cut_margin, DIRECTION_UP, is_enabled, cut_at
+            elif down_gap > thr_i:
+                return lo_cut, i, start_value - l[i] - thr - cut_margin, DIRECTION_DOWN, is_enabled, cut_at
+            is_up = up_arr[i]
+            if check_high <= hi_i and check_low >= lo_i:
+                direction = DIRECTION_UP if is_up else DIRECTION_DOWN
+                cut_at = hi_cut if is_up else lo_cut
+            elif check_high <= hi_i:
+                direction = DIRECTION_UP
+                cut_at = hi_cut
             else:
-                if upper_gap > int(cut_margin):
-                    time_data.end_value = int(candle.high - cut_margin)
-                    time_data.end_time = candle.date
-                    time_data.gain = candle.high - time_data.start_value - thr - cut_margin
-                    return True
-                if int(candle.high - cut_margin) > time_data.cut_at:
-                    time_data.cut_at = int(candle.high - cut_margin)
-                return False
+                direction = DIRECTION_DOWN
+                cut_at = lo_cut
+            is_enabled = True
+        if direction == DIRECTION_UP:
+            done, end_value, gain, cut_at = _handle_enabled_up(
+                start_value, thr, cut_margin, cm_i, cut_at, h[i], hi_i, lo_i, upper_gap, hi_cut)
         else:
-            if candle_low > time_data.cut_at:
-                time_data.end_value = time_data.cut_at
-                time_data.end_time = candle.date
-                time_data.gain = time_data.start_value - candle_low - thr
-                return True
-            elif candle_high > time_data.cut_at:
-                time_data.end_value = time_data.cut_at
-                time_data.end_time = candle.date
-                time_data.gain = time_data.start_value - time_data.cut_at - thr
-                return True
-            else:
-                if down_gap > int(cut_margin):
-                    time_data.end_value = int(candle.low + cut_margin)
-                    time_data.end_time = candle.date
-                    time_data.gain = time_data.start_value - candle.low - thr - cut_margin
-                    return True
-                if int(candle.low + cut_margin) < time_data.cut_at:
-                    time_data.cut_at = int(candle.low + cut_margin)
-                return False
-    else:
-        if check_high <= candle_high or check_low >= candle_low:
-            if upper_gap > int(thr):
-                time_data.direction = Direction.up
-                time_data.end_value = int(candle.high - cut_margin)
-                time_data.end_time = candle.date
-                time_data.gain = candle.high - time_data.start_value - thr - cut_margin
-                return True
-            elif down_gap > int(thr):
-                time_data.direction = Direction.down
-                time_data.end_value = int(candle.low + cut_margin)
-                time_data.end_time = candle.date
-                time_data.gain = time_data.start_value - candle.low - thr - cut_margin
-                return True
-            else:
-                if check_high <= candle_high and check_low >= candle_low:
-                    time_data.direction = Direction.up if is_up else Direction.down
-                    time_data.is_enabled = True
-                    time_data.cut_at = int(candle.high - cut_margin) if is_up else int(candle.low + cut_margin)
-                elif check_high <= candle_high:
-                    time_data.direction = Direction.up
-                    time_data.is_enabled = True
-                    time_data.cut_at = int(candle.high - cut_margin)
-                else:
-                    time_data.direction = Direction.down
-                    time_data.is_enabled = True
-                    time_data.cut_at = int(candle.low + cut_margin)
-                return run_thread(thr, time_data, candle, margin)
-        return False
-
-def check_in_time_data(thr_obj: Threshold, time_data: TimeData, one_minute_data: List[Candle], margin: float):
-    for candle in one_minute_data:
-        if candle.date < time_data.time:
-            continue
-        if run_thread(float(thr_obj.threshold), time_data, candle, margin):
-            break
-
-def check_in_date_data(thr_obj: Threshold, date_data: DateData, one_minute_data: List[Candle], margin: float):
-    for td in date_data.times:
-        check_in_time_data(thr_obj, td, one_minute_data, margin)
+            done, end_value, gain, cut_at = _handle_enabled_down(
+                start_value, thr, cut_margin, cm_i, cut_at, l[i], hi_i, lo_i, down_gap, lo_cut)
+        if done:
+            return end_value, i, gain, direction, is_enabled, cut_at
+    return 0, -1, 0.0, direction, is_enabled, cut_at
 
-def check_in_threshold(thr_obj: Threshold, one_minute_data: List[Candle], margin: float):
-    for dd in thr_obj.dates:
-        check_in_date_data(thr_obj, dd, one_minute_data, margin)
+@njit(cache=True)
+def _run_all_thresholds(slots, margin, h, l, hi_arr, lo_arr, up_arr, upper_gap_arr, down_gap_arr):
+    # runs serially: FastAPI calls this from threadpool workers, where numba's parallel
+    # threading layers are either not threadsafe (workqueue) or hang on exit (tbb)
+    n_thresholds, n_dates, n_hours = slots.shape
+    for ti in range(n_thresholds):
+        for di in range(n_dates):
+            for hi in range(n_hours):
+                slot = slots[ti, di, hi]
+                if slot.time_idx < 0:
+                    continue
+                end_value, end_idx, gain, direction, is_enabled, cut_at = _run_from(
+                    slot.time_idx, slot.start_value, float(slot.threshold), margin,
+                    h, l, hi_arr, lo_arr, up_arr, upper_gap_arr, down_gap_arr)
+                slot.end_value = end_value
+                slot.end_idx = end_idx
+                slot.gain = gain
+                slot.direction = direction
+                slot.is_enabled = is_enabled
+                slot.cut_at = cut_at
 
-def analysis(one_minute_data: List[Candle], margin: float) -> List[Threshold]:
-    thresholds: List[Threshold] = []
-    average_daily = average_daily_gap(one_minute_data)
+def analysis(arrays: CandleArrays, margin: float) -> AnalysisResult:
+    average_daily = average_daily_gap(arrays)
     arr_threshold = generate_range_values(average_daily / 3.0, average_daily * 1.5, 16)
     arr_threshold.sort()
-    min_date = one_minute_data[0].date
-    max_date = one_minute_data[-1].date
+    min_date = arrays.datetimes[0]
+    max_date = arrays.datetimes[-1]
     arr_dates = generate_date_array(min_date, max_date)
     
-    for t in arr_threshold:
-        thr_obj = Threshold(threshold=t)
-        for d in arr_dates:
-            date_data = DateData(date=d)
-            date_data.times = get_random_hourly_candles(d, one_minute_data, t)
-            thr_obj.dates.append(date_data)
-        thresholds.append(thr_obj)
-    
-    for thr_obj in thresholds:
-        check_in_threshold(thr_obj, one_minute_data, margin)
-    
-    return thresholds
+    # the hourly candles are drawn once per date and shared by every threshold
+    rng = np.random.default_rng()
+    lo, hi = hourly_bounds(arr_dates, arrays.dates)
+    start_indices = get_random_hourly_candles(rng, lo, hi)
+
+    shape = (len(arr_threshold), len(arr_dates), lo.shape[1])
+    slots = np.zeros(shape, dtype=TIME_DATA_DTYPE)
+    slots['threshold'] = np.asarray(arr_threshold, dtype=np.int64)[:, None, None]
+    slots['time_idx'] = start_indices[None, :, :]
+    slots['end_idx'] = -1
+    # empty buckets (-1) read the last candle; the kernel skips them anyway
+    slots['start_value'] = random_in_bounds(arrays.low_i[start_indices], arrays.high_i[start_indices], rng.random(shape))
+
+    _run_all_thresholds(slots, margin, arrays.high, arrays.low, arrays.high_i, arrays.low_i,
+                        arrays.is_up, arrays.upper_gap, arrays.down_gap)
+    return AnalysisResult(thresholds=arr_threshold, dates=arr_dates, slots=slots)
+
+# -----------------------
+# Serialization
+# -----------------------
+def _result_to_dicts(result: AnalysisResult, datetimes: List[datetime]) -> List[dict]:
+    # the slot tree is only materialized here; empty hours are dropped
+    directions = [d.name for d in Direction]
+    out = []
+    for thr, thr_slots in zip(result.thresholds, result.slots.tolist()):
+        dates = []
+        for d, date_slots in zip(result.dates, thr_slots):
+            times = []
+            for (threshold, time_idx, start_value, end_value, end_idx, is_enabled,
+                 direction, cut_at, gain, executed_tree) in date_slots:
+                if time_idx < 0:
+                    continue
+                times.append({
+                    'threshold': threshold,
+                    'time': datetimes[time_idx],
+                    'start_value': start_value,
+                    'end_value': end_value,
+                    'end_time': datetimes[end_idx] if end_idx >= 0 else None,
+                    'is_enabled': is_enabled,
+                    'direction': directions[direction],
+                    'cut_at': cut_at,
+                    'gain': gain,
+                    'executed_tree': executed_tree,
+                })
+            dates.append({'date': d, 'times': times})
+        out.append({'threshold': thr, 'dates': dates})
+    return out
+
+# -----------------------
+# Result Cache
+# -----------------------
+# serialized JSON responses keyed by a digest of the raw request body, which covers the
+# exact date strings and the margin; only touched from the event loop, so no locking is needed
+ANALYSIS_CACHE_SIZE = 32
+_analysis_cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+def _analysis_cache_key(raw: bytes) -> bytes:
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+def _cache_get(key: bytes):
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        _analysis_cache.move_to_end(key)
+    return cached
+
+def _cache_put(key: bytes, response: bytes):
+    _analysis_cache[key] = response
+    if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _analysis_cache.popitem(last=False)
 
 # -----------------------
 # API Endpoints
 # -----------------------
-@app.post("/analyze")
-def analyze_endpoint(req: AnalysisRequest):
-    one_minute_data = [Candle(**c.dict()) for c in req.candles]
-    result = analysis(one_minute_data, req.margin)
-    return [asdict(t) for t in result]
\ No newline at end of file
+def _analyze_body(raw: bytes) -> bytes:
+    arrays, margin = parse_analysis_request(raw)
+    result = analysis(arrays, margin)
+    return orjson.dumps(_result_to_dicts(result, arrays.datetimes))
+
+def _request_body_schema(model: type[BaseModel]) -> dict:
+    # openapi_extra needs a self-contained schema, so inline the nested model definitions
+    schema = model.model_json_schema()
+    defs = schema.pop('$defs', {})
+    for prop in schema['properties'].values():
+        ref = prop.get('items', {}).get('$ref', '')
+        if ref:
+            prop['items'] = defs[ref.rsplit('/', 1)[-1]]
+    return schema
+
+@app.post("/analyze", openapi_extra={"requestBody": {
+    "required": True,
+    "content": {"application/json": {"schema": _request_body_schema(AnalysisRequest)}},
+}})
+async def analyze_endpoint(request: Request):
+    # body is parsed by hand (see parse_analysis_request); AnalysisRequest documents it
+    raw = await request.body()
+    key = _analysis_cache_key(raw)
+    content = _cache_get(key)
+    if content is None:
+        content = await run_in_threadpool(_analyze_body, raw)
+        _cache_put(key, content)
+    return Response(content, media_type="application/json")
\ No newline at end of file
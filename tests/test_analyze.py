@@ -0,0 +1,151 @@
+import copy
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import main
+
+client = TestClient(main.app)
+
+def make_body(n: int = 30, margin: float = 10.0) -> dict:
+    start = datetime(2024, 1, 1, 9, 15)
+    candles = []
+    for i in range(n):
+        price = 20000.0 + 5 * (i % 7)
+        candles.append({'date': (start + timedelta(minutes=i)).isoformat() + '+05:30',
+                        'open': price, 'high': price + 12.5, 'low': price - 9.25,
+                        'close': price + 3.0, 'volume': 100 + i})
+    return {'candles': candles, 'margin': margin}
+
+def with_candle_field(key: str, value, index: int = -1) -> dict:
+    body = make_body()
+    body['candles'][index][key] = value
+    return body
+
+def pydantic_errors(body: dict) -> list:
+    # what the pydantic contract alone says about the same body
+    with pytest.raises(ValidationError) as exc:
+        main.AnalysisRequest.model_validate_json(orjson.dumps(body))
+    return [(['body', *err['loc']], err['type']) for err in exc.value.errors()]
+
+def response_errors(response) -> list:
+    return [(err['loc'], err['type']) for err in response.json()['detail']]
+
+# -----------------------
+# Parsing contract: the fast path rejects exactly what pydantic rejects
+# -----------------------
+@pytest.mark.parametrize("body", [
+    with_candle_field('open', None),
+    with_candle_field('high', None, index=0),
+    with_candle_field('low', None),
+    with_candle_field('close', 'abc'),
+    with_candle_field('volume', 1.5),
+    with_candle_field('volume', None),
+    with_candle_field('date', None),
+    with_candle_field('date', '2024-W01-1T09:15'),
+    with_candle_field('date', '20240101T091500'),
+    {**make_body(), 'candles': ''},
+    {**make_body(), 'candles': {}},
+    {**make_body(), 'margin': 'abc'},
+    {'candles': make_body()['candles']},
+], ids=['open-null', 'high-null', 'low-null', 'close-str', 'volume-float', 'volume-null',
+        'date-null', 'date-iso-week', 'date-basic-format', 'candles-str', 'candles-dict',
+        'margin-str', 'margin-missing'])
+def test_malformed_body_matches_pydantic_422(body):
+    response = client.post('/analyze', json=body)
+    assert response.status_code == 422
+    assert response_errors(response) == pydantic_errors(body)
+
+def test_invalid_json_is_422():
+    response = client.post('/analyze', content=b'{bad')
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['type'] == 'json_invalid'
+
+def test_unsorted_candles_are_422():
+    body = make_body()
+    body['candles'][3], body['candles'][4] = body['candles'][4], body['candles'][3]
+    response = client.post('/analyze', json=body)
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', 'candles']
+
+def test_empty_candles_is_422():
+    response = client.post('/analyze', json={'candles': [], 'margin': 1})
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', 'candles']
+
+@pytest.mark.parametrize("key, value", [
+    ('date', 1704082440),          # unix epoch of the last candle
+    ('date', '2024-01-01T04:14Z'),  # same instant, no seconds
+    ('volume', 7.0),
+    ('open', '20000.5'),
+])
+def test_fallback_accepts_what_pydantic_accepts(key, value):
+    body = with_candle_field(key, value)
+    main.AnalysisRequest.model_validate_json(orjson.dumps(body))
+    assert client.post('/analyze', json=body).status_code == 200
+
+def test_fast_path_and_fallback_parse_the_same_arrays():
+    body = make_body()
+    fallback_body = copy.deepcopy(body)
+    # an epoch date anywhere pushes the whole body through pydantic
+    first = datetime.fromisoformat(body['candles'][0]['date'])
+    fallback_body['candles'][0]['date'] = int(first.timestamp())
+
+    fast, fast_margin = main.parse_analysis_request(orjson.dumps(body))
+    slow, slow_margin = main.parse_analysis_request(orjson.dumps(fallback_body))
+
+    assert fast_margin == slow_margin
+    for column in ('open', 'high', 'low', 'close', 'dates', 'high_i', 'low_i', 'upper_gap', 'down_gap'):
+        np.testing.assert_array_equal(getattr(fast, column), getattr(slow, column))
+    assert fast.datetimes[1:] == slow.datetimes[1:]
+
+# -----------------------
+# Result cache
+# -----------------------
+@pytest.fixture
+def analyze_calls(monkeypatch):
+    # empty cache, and a record of every body that actually reaches _analyze_body
+    monkeypatch.setattr(main, '_analysis_cache', OrderedDict())
+    calls = []
+    real = main._analyze_body
+
+    def counting(raw: bytes) -> bytes:
+        calls.append(raw)
+        return real(raw)
+
+    monkeypatch.setattr(main, '_analyze_body', counting)
+    return calls
+
+def test_repeated_body_is_served_from_cache(analyze_calls):
+    body = make_body()
+    first = client.post('/analyze', json=body)
+    second = client.post('/analyze', json=body)
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert len(analyze_calls) == 1
+
+def test_cache_evicts_least_recently_used(analyze_calls):
+    bodies = [make_body(margin=float(m)) for m in range(main.ANALYSIS_CACHE_SIZE + 1)]
+    for body in bodies[:main.ANALYSIS_CACHE_SIZE]:
+        client.post('/analyze', json=body)
+    client.post('/analyze', json=bodies[0])  # hit: bodies[0] becomes most recently used
+    client.post('/analyze', json=bodies[-1])  # the 33rd distinct body evicts bodies[1]
+    assert len(main._analysis_cache) == main.ANALYSIS_CACHE_SIZE
+    assert len(analyze_calls) == main.ANALYSIS_CACHE_SIZE + 1
+
+    client.post('/analyze', json=bodies[0])
+    assert len(analyze_calls) == main.ANALYSIS_CACHE_SIZE + 1
+    client.post('/analyze', json=bodies[1])
+    assert len(analyze_calls) == main.ANALYSIS_CACHE_SIZE + 2
+
+def test_error_responses_are_not_cached(analyze_calls):
+    body = with_candle_field('open', None)
+    for _ in range(2):
+        assert client.post('/analyze', json=body).status_code == 422
+    assert len(analyze_calls) == 2
+    assert len(main._analysis_cache) == 0
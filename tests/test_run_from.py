@@ -0,0 +1,173 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+
+import numpy as np
+import pytest
+
+import main
+
+# -----------------------
+# Reference: the per-candle state machine as it was before the numba kernel
+# -----------------------
+@dataclass
+class Candle:
+    date: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+
+class Direction(str, Enum):
+    none = "none"
+    up = "up"
+    down = "down"
+
+@dataclass
+class TimeData:
+    start_value: int = 0
+    end_value: int = 0
+    end_time: datetime = None
+    is_enabled: bool = False
+    direction: Direction = Direction.none
+    cut_at: int = 0
+    gain: float = 0.0
+
+def run_thread(thr: float, time_data: TimeData, candle: Candle, margin: float) -> bool:
+    cut_margin = thr * (margin / 100)
+    if time_data.end_value != 0:
+        return True
+    is_up = candle.close > candle.open
+    upper_gap = int(candle.high - candle.close)
+    down_gap = int(candle.close - candle.low)
+    check_high = time_data.start_value + int(thr)
+    check_low = time_data.start_value - int(thr)
+    candle_high = int(candle.high)
+    candle_low = int(candle.low)
+    if time_data.is_enabled:
+        if time_data.direction == Direction.up:
+            if candle_high < time_data.cut_at:
+                time_data.end_value = time_data.cut_at
+                time_data.end_time = candle.date
+                time_data.gain = candle_high - time_data.start_value - thr
+                return True
+            elif candle_low < time_data.cut_at:
+                time_data.end_value = time_data.cut_at
+                time_data.end_time = candle.date
+                time_data.gain = time_data.cut_at - time_data.start_value - thr
+                return True
+            else:
+                if upper_gap > int(cut_margin):
+                    time_data.end_value = int(candle.high - cut_margin)
+                    time_data.end_time = candle.date
+                    time_data.gain = candle.high - time_data.start_value - thr - cut_margin
+                    return True
+                if int(candle.high - cut_margin) > time_data.cut_at:
+                    time_data.cut_at = int(candle.high - cut_margin)
+                return False
+        else:
+            if candle_low > time_data.cut_at:
+                time_data.end_value = time_data.cut_at
+                time_data.end_time = candle.date
+                time_data.gain = time_data.start_value - candle_low - thr
+                return True
+            elif candle_high > time_data.cut_at:
+                time_data.end_value = time_data.cut_at
+                time_data.end_time = candle.date
+                time_data.gain = time_data.start_value - time_data.cut_at - thr
+                return True
+            else:
+                if down_gap > int(cut_margin):
+                    time_data.end_value = int(candle.low + cut_margin)
+                    time_data.end_time = candle.date
+                    time_data.gain = time_data.start_value - candle.low - thr - cut_margin
+                    return True
+                if int(candle.low + cut_margin) < time_data.cut_at:
+                    time_data.cut_at = int(candle.low + cut_margin)
+                return False
+    else:
+        if check_high <= candle_high or check_low >= candle_low:
+            if upper_gap > int(thr):
+                time_data.direction = Direction.up
+                time_data.end_value = int(candle.high - cut_margin)
+                time_data.end_time = candle.date
+                time_data.gain = candle.high - time_data.start_value - thr - cut_margin
+                return True
+            elif down_gap > int(thr):
+                time_data.direction = Direction.down
+                time_data.end_value = int(candle.low + cut_margin)
+                time_data.end_time = candle.date
+                time_data.gain = time_data.start_value - candle.low - thr - cut_margin
+                return True
+            else:
+                if check_high <= candle_high and check_low >= candle_low:
+                    time_data.direction = Direction.up if is_up else Direction.down
+                    time_data.is_enabled = True
+                    time_data.cut_at = int(candle.high - cut_margin) if is_up else int(candle.low + cut_margin)
+                elif check_high <= candle_high:
+                    time_data.direction = Direction.up
+                    time_data.is_enabled = True
+                    time_data.cut_at = int(candle.high - cut_margin)
+                else:
+                    time_data.direction = Direction.down
+                    time_data.is_enabled = True
+                    time_data.cut_at = int(candle.low + cut_margin)
+                return run_thread(thr, time_data, candle, margin)
+        return False
+
+def make_candles(n: int, seed: int):
+    rng = random.Random(seed)
+    candles, price = [], 20000.0
+    start = datetime(2024, 1, 1, 9, 15)
+    for i in range(n):
+        o, c = price, price + rng.gauss(0, 8)
+        h = max(o, c) + abs(rng.gauss(0, 4))
+        l = min(o, c) - abs(rng.gauss(0, 4))
+        candles.append(Candle(start + timedelta(minutes=i), o, h, l, c))
+        price = c
+    return candles
+
+def to_arrays(candles):
+    datetimes = [c.date for c in candles]
+    return main.CandleArrays(
+        open=np.array([c.open for c in candles]),
+        high=np.array([c.high for c in candles]),
+        low=np.array([c.low for c in candles]),
+        close=np.array([c.close for c in candles]),
+        dates=np.array([int(d.timestamp()) for d in datetimes], dtype=np.int64),
+        days=np.array([d.toordinal() for d in datetimes], dtype=np.int64),
+        datetimes=datetimes,
+    )
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("margin", [0.0, 10.0, 50.0])
+def test_run_from_matches_run_thread(seed, margin):
+    candles = make_candles(2000, seed)
+    arrays = to_arrays(candles)
+    rng = random.Random(seed)
+    directions = {main.DIRECTION_NONE: Direction.none, main.DIRECTION_UP: Direction.up,
+                  main.DIRECTION_DOWN: Direction.down}
+    for _ in range(200):
+        i0 = rng.randrange(len(candles))
+        thr = rng.randint(1, 60)
+        start_value = rng.randint(int(candles[i0].low), int(candles[i0].high))
+
+        ref = TimeData(start_value=start_value)
+        for candle in candles[i0:]:
+            if run_thread(float(thr), ref, candle, margin):
+                break
+
+        end_value, end_idx, gain, direction, is_enabled, cut_at = main._run_from(
+            i0, start_value, float(thr), margin, arrays.high, arrays.low, arrays.high_i,
+            arrays.low_i, arrays.is_up, arrays.upper_gap, arrays.down_gap)
+
+        assert directions[direction] == ref.direction
+        assert is_enabled == ref.is_enabled
+        assert cut_at == ref.cut_at
+        if end_idx < 0:
+            assert ref.end_value == 0
+        else:
+            assert end_value == ref.end_value
+            assert candles[end_idx].date == ref.end_time
+            assert gain == pytest.approx(ref.gain)